@@ -0,0 +1,171 @@
+"""Micro-benchmark for webhook ingress on status-heavy traffic
+
+Compares the previous ingress path (json parsing plus pretty-printing every
+level of the payload) with the raw-body fast path (HMAC verification, status
+short-circuit on raw bytes, orjson parsing for message deliveries).
+
+Run from the repository root:
+
+    python benchmarks/webhook_benchmark.py
+"""
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.webhook_utils import is_status_only, parse_webhook, verify_signature
+
+APP_SECRET = "benchmark-secret"
+STATUS_SHARE = 0.95
+REQUESTS = 20000
+
+
+def status_payload(i: int) -> bytes:
+    return json.dumps(
+        {
+            "object": "whatsapp_business_account",
+            "entry": [
+                {
+                    "id": "102290129340398",
+                    "changes": [
+                        {
+                            "value": {
+                                "messaging_product": "whatsapp",
+                                "metadata": {
+                                    "display_phone_number": "15550783881",
+                                    "phone_number_id": "106540352242922",
+                                },
+                                "statuses": [
+                                    {
+                                        "id": f"wamid.HBgLMTY1MDM4Nzk0MzkVAgARGBI{i}",
+                                        "status": "read",
+                                        "timestamp": "1674593087",
+                                        "recipient_id": "16505551234",
+                                        "conversation": {
+                                            "id": "2cdee10b4ccd2b34c52b1ba8e4f4f7d8",
+                                            "origin": {"type": "service"},
+                                        },
+                                        "pricing": {
+                                            "billable": True,
+                                            "pricing_model": "CBP",
+                                            "category": "service",
+                                        },
+                                    }
+                                ],
+                            },
+                            "field": "messages",
+                        }
+                    ],
+                }
+            ],
+        }
+    ).encode()
+
+
+def message_payload(i: int) -> bytes:
+    return json.dumps(
+        {
+            "object": "whatsapp_business_account",
+            "entry": [
+                {
+                    "id": "102290129340398",
+                    "changes": [
+                        {
+                            "value": {
+                                "messaging_product": "whatsapp",
+                                "metadata": {
+                                    "display_phone_number": "15550783881",
+                                    "phone_number_id": "106540352242922",
+                                },
+                                "contacts": [
+                                    {
+                                        "profile": {"name": "Caregiver"},
+                                        "wa_id": "16505551234",
+                                    }
+                                ],
+                                "messages": [
+                                    {
+                                        "from": "16505551234",
+                                        "id": f"wamid.HBgLMTY1MDM4Nzk0MzkVAgASGBQ{i}",
+                                        "timestamp": "1674593087",
+                                        "type": "text",
+                                        "text": {"body": "help"},
+                                    }
+                                ],
+                            },
+                            "field": "messages",
+                        }
+                    ],
+                }
+            ],
+        }
+    ).encode()
+
+
+def sign(body: bytes) -> str:
+    return "sha256=" + hmac.new(APP_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def legacy_ingress(body: bytes, signature: str) -> str:
+    """The previous path: parse, pretty-print each level, then inspect"""
+    payload = json.loads(body)
+    json.dumps(payload, indent=2)
+    entry = payload.get("entry", [{}])[0]
+    changes = entry.get("changes", [{}])[0]
+    value = changes.get("value", {})
+    json.dumps(entry, indent=2)
+    json.dumps(changes, indent=2)
+    json.dumps(value, indent=2)
+    statuses = value.get("statuses", [])
+    if statuses:
+        json.dumps(statuses, indent=2)
+        return "status"
+    message = value.get("messages", [{}])[0]
+    json.dumps(message, indent=2)
+    return message.get("type", "text")
+
+
+def fast_ingress(body: bytes, signature: str) -> str:
+    """The raw-body path used by the /webhook endpoint"""
+    if not verify_signature(body, signature, APP_SECRET):
+        raise ValueError("Invalid signature")
+    if is_status_only(body):
+        return "status"
+    envelope = parse_webhook(body)
+    return envelope.messages[0].type
+
+
+def run(ingress, deliveries) -> float:
+    start = time.perf_counter()
+    for body, signature in deliveries:
+        ingress(body, signature)
+    return len(deliveries) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    status_count = int(REQUESTS * STATUS_SHARE)
+    bodies = [status_payload(i) for i in range(status_count)] + [
+        message_payload(i) for i in range(REQUESTS - status_count)
+    ]
+    deliveries = [(body, sign(body)) for body in bodies]
+
+    # Both paths must agree on every delivery
+    for body, signature in deliveries[:: REQUESTS // 100]:
+        assert legacy_ingress(body, signature) == fast_ingress(body, signature)
+
+    print(
+        f"{REQUESTS} deliveries, {STATUS_SHARE:.0%} status updates "
+        f"(ingress only, excluding HTTP and logging I/O)"
+    )
+    legacy = run(legacy_ingress, deliveries)
+    fast = run(fast_ingress, deliveries)
+    print(f"  legacy path: {legacy:>10,.0f} requests/s")
+    print(f"  fast path:   {fast:>10,.0f} requests/s  ({fast / legacy:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,7 @@ class Settings(BaseSettings):
     whatsapp_api_token: str = os.getenv("WHATSAPP_API_TOKEN", "")
     whatsapp_phone_number_id: str = os.getenv("WHATSAPP_PHONE_NUMBER_ID", "")
     verify_token: str = os.getenv("VERIFY_TOKEN", "")
+    whatsapp_app_secret: str = os.getenv("WHATSAPP_APP_SECRET", "")
     whatsapp_api_version: str = "v21.0"
 
     # Server Configuration
@@ -39,6 +40,42 @@ class Settings(BaseSettings):
     speech_recognition_dynamic_energy_threshold: bool = True
     speech_recognition_pause_threshold: float = 0.8
 
+    # Silence trimming: drop dead air and shorten long pauses before Whisper
+    silence_trimming_enabled: bool = (
+        os.getenv("SILENCE_TRIMMING_ENABLED", "false").lower() == "true"
+    )
+    silence_threshold_margin_db: float = 12.0  # Above the noise floor
+    silence_padding: float = 0.2  # Seconds kept around each speech region
+    silence_max_pause: float = 0.5  # Longer pauses are shortened to this
+    loudness_target_dbfs: float = -20.0
+
+    # Deadline Configuration (seconds)
+    # Each job gets a total budget; every stage is capped by its own timeout
+    # and by whatever is left of the job budget.
+    job_deadline: float = float(os.getenv("JOB_DEADLINE", "1800"))
+    media_url_timeout: float = float(os.getenv("MEDIA_URL_TIMEOUT", "15"))
+    download_timeout: float = float(os.getenv("DOWNLOAD_TIMEOUT", "120"))
+    conversion_timeout: float = float(os.getenv("CONVERSION_TIMEOUT", "300"))
+    preprocessing_timeout: float = float(os.getenv("PREPROCESSING_TIMEOUT", "120"))
+    transcription_timeout: float = float(os.getenv("TRANSCRIPTION_TIMEOUT", "1500"))
+    report_timeout: float = float(os.getenv("REPORT_TIMEOUT", "120"))
+    send_timeout: float = float(os.getenv("SEND_TIMEOUT", "30"))
+
+    # Outbox Configuration
+    # Graph API allows 80 messages/second per business phone number and a
+    # much lower sustained rate per recipient.
+    outbox_db_path: str = os.getenv("OUTBOX_DB_PATH", "outbox.db")
+    outbox_senders: int = int(os.getenv("OUTBOX_SENDERS", "4"))
+    outbox_phone_rate: float = float(os.getenv("OUTBOX_PHONE_RATE", "80"))
+    outbox_phone_burst: float = float(os.getenv("OUTBOX_PHONE_BURST", "80"))
+    outbox_recipient_rate: float = float(os.getenv("OUTBOX_RECIPIENT_RATE", "0.17"))
+    outbox_recipient_burst: float = float(os.getenv("OUTBOX_RECIPIENT_BURST", "3"))
+    outbox_max_attempts: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+    # Failed messages are kept (without their text) for this many seconds
+    outbox_failed_retention: float = float(
+        os.getenv("OUTBOX_FAILED_RETENTION", str(7 * 24 * 3600))
+    )
+
     # Logging Configuration
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
     log_file: str = os.getenv("LOG_FILE", "chatbot.log")
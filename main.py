@@ -1,11 +1,16 @@
 from fastapi import FastAPI, Request, HTTPException
 import uvicorn
+import asyncio
+import functools
 import json
 from config import settings
 from services.whatsapp_service import WhatsAppService
 from services.openai_service import OpenAIService
 from services.audio_service import AudioService
+from services.outbox_service import OutboxService
 from utils.logging_utils import setup_logger
+from utils.deadline import Deadline, StageTimeoutError, get_stage_timeouts
+from utils.webhook_utils import is_status_only, parse_webhook, verify_signature
 
 # Configure logging
 logger = setup_logger("mental_health_bot", log_file="chatbot.log")
@@ -18,11 +23,52 @@ whatsapp_service = WhatsAppService(
     api_token=settings.whatsapp_api_token,
     phone_number_id=settings.whatsapp_phone_number_id,
     api_version=settings.whatsapp_api_version,
+    timeout=settings.send_timeout,
 )
 
 openai_service = OpenAIService(api_key=settings.openai_api_key)
 audio_service = AudioService()
 
+if not settings.whatsapp_app_secret:
+    logger.warning(
+        "WHATSAPP_APP_SECRET is not set; webhook signatures will not be verified"
+    )
+outbox = OutboxService(
+    whatsapp_service,
+    db_path=settings.outbox_db_path,
+    senders=settings.outbox_senders,
+    phone_rate=settings.outbox_phone_rate,
+    phone_burst=settings.outbox_phone_burst,
+    recipient_rate=settings.outbox_recipient_rate,
+    recipient_burst=settings.outbox_recipient_burst,
+    max_attempts=settings.outbox_max_attempts,
+    failed_retention=settings.outbox_failed_retention,
+)
+
+# User-facing descriptions of the pipeline stages, used in timeout messages
+STAGE_DESCRIPTIONS = {
+    "media_url": "retrieving your audio",
+    "download": "downloading your audio",
+    "conversion": "converting your audio",
+    "preprocessing": "preparing your audio",
+    "transcription": "transcribing your audio",
+    "report": "generating the report",
+}
+
+
+@app.on_event("startup")
+async def startup_event():
+    """Start draining the outbox and load the Whisper model"""
+    outbox.start()
+    await audio_service.start_worker()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the outbox senders and the transcription worker process"""
+    await outbox.stop()
+    audio_service.worker.close()
+
 
 @app.get("/test")
 async def test_endpoint():
@@ -91,65 +137,54 @@ async def verify_webhook(request: Request):
 @app.post("/webhook")
 async def webhook(request: Request):
     """Handle incoming WhatsApp messages"""
+    # Read the raw body once; the signature is computed over these exact bytes
+    body = await request.body()
+
+    if settings.whatsapp_app_secret and not verify_signature(
+        body,
+        request.headers.get("x-hub-signature-256"),
+        settings.whatsapp_app_secret,
+    ):
+        logger.warning("Rejected webhook with invalid signature")
+        raise HTTPException(status_code=403, detail="Invalid signature")
+
+    # Most deliveries are delivery/read receipts; answer them without parsing
+    if is_status_only(body):
+        return {"status": "status update received"}
+
     try:
         logger.info("=== NEW WEBHOOK REQUEST ===")
-        logger.info("Received POST request to /webhook")
 
-        # Log raw request body
-        body = await request.json()
-        logger.info("Raw webhook body:")
-        logger.info(json.dumps(body, indent=2))
-
-        # Extract the data
-        entry = body.get("entry", [{}])[0]
-        changes = entry.get("changes", [{}])[0]
-        value = changes.get("value", {})
-
-        logger.info("=== WEBHOOK DATA STRUCTURE ===")
-        logger.info("Entry:")
-        logger.info(json.dumps(entry, indent=2))
-        logger.info("Changes:")
-        logger.info(json.dumps(changes, indent=2))
-        logger.info("Value:")
-        logger.info(json.dumps(value, indent=2))
-
-        # Check if this is a message or a status update
-        messages = value.get("messages", [])
-        statuses = value.get("statuses", [])
+        envelope = parse_webhook(body)
 
         # If it's a status update, just acknowledge it
-        if statuses:
-            logger.info("=== STATUS UPDATE ===")
-            logger.info(json.dumps(statuses, indent=2))
+        if envelope.has_statuses and not envelope.messages:
             return {"status": "status update received"}
 
         # If no messages, return early
-        if not messages or len(messages) == 0:
+        if not envelope.messages:
             logger.warning("No messages found in webhook body")
             return {"status": "no message"}
 
-        message = messages[0]
-        phone_number = message.get("from")
+        message = envelope.messages[0]
+        phone_number = message.sender
         logger.info(f"=== MESSAGE RECEIVED FROM: {phone_number} ===")
-        logger.info("Full message data:")
-        logger.info(json.dumps(message, indent=2))
 
         if not phone_number:
             logger.warning("Message received without a phone number")
             return {"status": "error", "message": "No phone number provided"}
 
-        message_type = message.get("type", "text")
+        message_type = message.type
         logger.info(f"Message type: {message_type}")
 
         # Handle audio messages and audio documents
         if message_type in ["audio", "document"]:
             try:
                 logger.info("=== PROCESSING AUDIO MESSAGE ===")
+                deadline = Deadline(settings.job_deadline)
                 # Get audio data
-                if message_type == "audio":
-                    media_data = message.get("audio", {})
-                else:  # document
-                    media_data = message.get("document", {})
+                media_data = message.media
+                if message_type == "document":
                     # Check if it's an audio document
                     mime_type = media_data.get("mime_type", "")
                     if not any(
@@ -157,32 +192,48 @@ async def webhook(request: Request):
                     ):
                         error_msg = "I can only process audio files. Please send an audio message or audio file."
                         logger.warning(f"Unsupported document type: {mime_type}")
-                        whatsapp_service.send_message(phone_number, error_msg)
+                        outbox.enqueue(phone_number, error_msg)
                         return {
                             "status": "error",
                             "message": "Unsupported document type",
                         }
 
-                logger.info("Media data:")
-                logger.info(json.dumps(media_data, indent=2))
+                logger.debug("Media data: %s", media_data)
 
                 if media_data and (media_id := media_data.get("id")):
                     logger.info(f"Processing audio with ID: {media_id}")
-                    media_url = WhatsAppService.get_media_url(
-                        media_id,
-                        settings.whatsapp_api_token,
-                        settings.whatsapp_api_version,
+                    # Graph API calls are blocking; keep them off the event loop
+                    loop = asyncio.get_event_loop()
+                    media_url = await loop.run_in_executor(
+                        None,
+                        functools.partial(
+                            WhatsAppService.get_media_url,
+                            media_id,
+                            settings.whatsapp_api_token,
+                            settings.whatsapp_api_version,
+                            timeout=deadline.stage_timeout(
+                                "media_url", settings.media_url_timeout
+                            ),
+                        ),
                     )
                     logger.info(f"Retrieved media URL: {media_url}")
 
                     if not media_url:
                         error_msg = "Failed to retrieve audio URL. Please try sending the audio again."
                         logger.error("Failed to get media URL")
-                        whatsapp_service.send_message(phone_number, error_msg)
+                        outbox.enqueue(phone_number, error_msg)
                         return {"status": "error", "message": "Failed to get media URL"}
 
-                    audio_data = WhatsAppService.download_media(
-                        media_url, settings.whatsapp_api_token
+                    audio_data = await loop.run_in_executor(
+                        None,
+                        functools.partial(
+                            WhatsAppService.download_media,
+                            media_url,
+                            settings.whatsapp_api_token,
+                            timeout=deadline.stage_timeout(
+                                "download", settings.download_timeout
+                            ),
+                        ),
                     )
                     logger.info(
                         f"Downloaded audio data size: {len(audio_data) if audio_data else 0} bytes"
@@ -191,7 +242,7 @@ async def webhook(request: Request):
                     if not audio_data:
                         error_msg = "Failed to download audio. Please try sending the audio again."
                         logger.error("Failed to download media")
-                        whatsapp_service.send_message(phone_number, error_msg)
+                        outbox.enqueue(phone_number, error_msg)
                         return {
                             "status": "error",
                             "message": "Failed to download media",
@@ -200,7 +251,7 @@ async def webhook(request: Request):
                     # Send processing message
                     processing_msg = "I'm processing your audio recording. This may take a few minutes..."
                     logger.info("Sending processing message")
-                    whatsapp_service.send_message(phone_number, processing_msg)
+                    outbox.enqueue(phone_number, processing_msg)
 
                     # Get file type from mime_type
                     mime_type = media_data.get("mime_type", "")
@@ -214,22 +265,24 @@ async def webhook(request: Request):
                     # Transcribe audio
                     logger.info("Starting audio transcription")
                     transcript = await audio_service.transcribe_audio(
-                        audio_data, file_type
+                        audio_data, file_type, deadline
                     )
                     if not transcript:
                         error_msg = "Failed to transcribe the audio. Please try again with a clearer recording."
                         logger.error("Transcription failed")
-                        whatsapp_service.send_message(phone_number, error_msg)
+                        outbox.enqueue(phone_number, error_msg)
                         return {"status": "error", "message": "Transcription failed"}
                     logger.info(f"Transcription successful: {transcript[:100]}...")
 
                     # Generate report
                     logger.info("Starting report generation")
-                    report = await audio_service.generate_report(transcript)
+                    report = await audio_service.generate_report(
+                        transcript, deadline
+                    )
                     if not report:
                         error_msg = "Failed to generate the report. Please try again."
                         logger.error("Report generation failed")
-                        whatsapp_service.send_message(phone_number, error_msg)
+                        outbox.enqueue(phone_number, error_msg)
                         return {
                             "status": "error",
                             "message": "Report generation failed",
@@ -238,20 +291,29 @@ async def webhook(request: Request):
 
                     # Send report
                     logger.info("Sending report")
-                    whatsapp_service.send_message(phone_number, report)
+                    outbox.enqueue(phone_number, report)
                     return {"status": "success"}
 
+            except StageTimeoutError as e:
+                logger.error(f"Audio processing timed out: {str(e)}")
+                stage = STAGE_DESCRIPTIONS.get(e.stage, "processing your audio")
+                error_msg = (
+                    f"Sorry, {stage} took too long and was stopped. "
+                    "Please try again later, or send a shorter recording."
+                )
+                outbox.enqueue(phone_number, error_msg)
+                return {"status": "error", "message": str(e)}
             except Exception as e:
                 logger.error(f"Error processing audio message: {str(e)}")
                 error_msg = (
                     "I encountered an error processing your audio. Please try again."
                 )
-                whatsapp_service.send_message(phone_number, error_msg)
+                outbox.enqueue(phone_number, error_msg)
                 return {"status": "error", "message": str(e)}
 
         # Handle text messages
         elif message_type == "text":
-            message_text = message.get("text", {}).get("body", "")
+            message_text = message.text
             logger.info(f"Received text message: {message_text}")
 
             if message_text.lower() in ["help", "start"]:
@@ -274,18 +336,18 @@ async def webhook(request: Request):
                 Please ensure your audio recording is clear.
                 """
                 logger.info("Sending help message")
-                whatsapp_service.send_message(phone_number, help_message)
+                outbox.enqueue(phone_number, help_message)
                 return {"status": "success"}
             else:
                 error_msg = "I can only process audio recordings. Please send an audio message of your patient conversation."
                 logger.info("Sending unsupported message type response")
-                whatsapp_service.send_message(phone_number, error_msg)
+                outbox.enqueue(phone_number, error_msg)
                 return {"status": "error", "message": "Unsupported message type"}
 
         else:
             logger.warning(f"Unsupported message type: {message_type}")
             error_msg = "I can only process audio recordings. Please send an audio message of your patient conversation."
-            whatsapp_service.send_message(phone_number, error_msg)
+            outbox.enqueue(phone_number, error_msg)
             return {"status": "error", "message": "Unsupported message type"}
 
     except Exception as e:
@@ -303,6 +365,16 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/stats")
+async def stats():
+    """Per-stage timeout counters, outbox queue sizes and silence trimming totals"""
+    return {
+        "stage_timeouts": get_stage_timeouts(),
+        "outbox": outbox.stats(),
+        "silence_trimming": audio_service.preprocessing_stats,
+    }
+
+
 @app.get("/test-whatsapp")
 async def test_whatsapp():
     """Test endpoint to send a WhatsApp message"""
@@ -1,11 +1,24 @@
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 from config import settings
 import tempfile
-import subprocess
 import os
-import whisper
+import asyncio
 from services.openai_service import OpenAIService
+from services.transcription_worker import TranscriptionWorker
+from utils.deadline import (
+    Deadline,
+    StageTimeoutError,
+    record_stage_timeout,
+    run_subprocess,
+)
+from utils.audio_utils import (
+    TimestampMap,
+    compact_speech,
+    normalize_loudness,
+    read_wav,
+    write_wav,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -17,11 +30,17 @@ class AudioService:
 
     def __init__(self):
         logger.info("Initializing AudioService...")
-        # Initialize Whisper model
+        # Whisper runs in a separate, killable worker process, started by
+        # start_worker() once the app is up
         try:
-            logger.info("Loading Whisper model...")
-            self.model = whisper.load_model("base")
-            logger.info("Whisper model loaded successfully")
+            self.worker = TranscriptionWorker("base")
+
+            # Totals for the silence trimming pre-pass
+            self.preprocessing_stats = {
+                "jobs": 0,
+                "input_seconds": 0.0,
+                "removed_seconds": 0.0,
+            }
 
             # Initialize OpenAI service
             self.openai_service = OpenAIService(settings.openai_api_key)
@@ -30,10 +49,29 @@ class AudioService:
             logger.error(f"Error initializing services: {str(e)}")
             raise
 
+    async def start_worker(self) -> None:
+        """Start the transcription worker and load the Whisper model"""
+        logger.info("Loading Whisper model...")
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self.worker.start)
+        logger.info("Whisper model loaded successfully")
+
     async def transcribe_audio(
-        self, audio_data: bytes, file_type: str = "ogg"
+        self,
+        audio_data: bytes,
+        file_type: str = "ogg",
+        deadline: Optional[Deadline] = None,
     ) -> Optional[str]:
-        """Transcribe audio to text using Whisper"""
+        """Transcribe audio to text using Whisper
+
+        Conversion and transcription are each bounded by their configured
+        timeout and by what is left of the job deadline. Raises
+        StageTimeoutError when either stage overruns.
+        """
+        deadline = deadline or Deadline(settings.job_deadline)
+        temp_input_path = None
+        temp_wav_path = None
+        temp_trimmed_path = None
         try:
             logger.info(f"Starting audio transcription process for {file_type} file")
             # Save the audio data to a temporary file
@@ -49,67 +87,161 @@ class AudioService:
             logger.info(f"Converting audio to WAV format: {temp_wav_path}")
 
             # Handle different input formats
+            conversion_timeout = deadline.stage_timeout(
+                "conversion", settings.conversion_timeout
+            )
+            command = ["ffmpeg", "-i", temp_input_path]
             if file_type == "mp4":
                 # Extract audio from MP4
-                subprocess.run(
-                    [
-                        "ffmpeg",
-                        "-i",
-                        temp_input_path,
-                        "-vn",  # No video
-                        "-acodec",
-                        "pcm_s16le",
-                        "-ar",
-                        "16000",
-                        "-ac",
-                        "1",
-                        temp_wav_path,
-                    ],
-                    check=True,
-                )
-            else:
-                # Handle MP3 and OGG
-                subprocess.run(
-                    [
-                        "ffmpeg",
-                        "-i",
-                        temp_input_path,
-                        "-acodec",
-                        "pcm_s16le",
-                        "-ar",
-                        "16000",
-                        "-ac",
-                        "1",
-                        temp_wav_path,
-                    ],
-                    check=True,
-                )
+                command.append("-vn")  # No video
+            command += [
+                "-acodec",
+                "pcm_s16le",
+                "-ar",
+                "16000",
+                "-ac",
+                "1",
+                temp_wav_path,
+            ]
+            # ffmpeg is killed if it overruns
+            await run_subprocess(command, "conversion", conversion_timeout)
 
             logger.info("Audio conversion completed")
 
+            timestamp_map = None
+            transcribe_path = temp_wav_path
+            if settings.silence_trimming_enabled:
+                temp_trimmed_path = temp_wav_path.replace(".wav", ".trimmed.wav")
+                timestamp_map = await self._run_preprocessing(
+                    temp_wav_path, temp_trimmed_path, deadline
+                )
+                if timestamp_map is not None:
+                    transcribe_path = temp_trimmed_path
+
             # Transcribe using Whisper
             logger.info("Starting Whisper transcription")
-            result = self.model.transcribe(temp_wav_path)
-            transcript = result["text"].strip()
+            transcript, segments = await self.worker.transcribe(
+                transcribe_path,
+                deadline.stage_timeout(
+                    "transcription", settings.transcription_timeout
+                ),
+            )
             logger.info(f"Transcription completed: {transcript[:100]}...")
 
-            # Clean up temporary files
-            os.unlink(temp_input_path)
-            os.unlink(temp_wav_path)
-            logger.info("Temporary files cleaned up")
+            if timestamp_map is not None and segments:
+                # Report segment times on the original recording's timeline
+                segments = [
+                    (
+                        timestamp_map.to_original(start),
+                        timestamp_map.to_original(end),
+                        text,
+                    )
+                    for start, end, text in segments
+                ]
+            if segments:
+                logger.info(
+                    f"Transcript has {len(segments)} segments spanning "
+                    f"{segments[0][0]:.1f}s-{segments[-1][1]:.1f}s of the recording"
+                )
 
             return transcript
 
+        except StageTimeoutError as e:
+            logger.error(f"Audio processing timed out: {str(e)}")
+            raise
         except Exception as e:
             logger.error(f"Error transcribing audio: {str(e)}")
             return None
+        finally:
+            # Clean up temporary files
+            for path in (temp_input_path, temp_wav_path, temp_trimmed_path):
+                if path and os.path.exists(path):
+                    os.unlink(path)
+            logger.info("Temporary files cleaned up")
+
+    async def _run_preprocessing(
+        self, wav_path: str, output_path: str, deadline: Deadline
+    ) -> Optional[TimestampMap]:
+        """Run the silence trimming pre-pass within its share of the deadline
+
+        The pre-pass is optional: if it fails or overruns, the job carries on
+        with the untrimmed audio and None is returned.
+        """
+        timeout = deadline.stage_timeout(
+            "preprocessing", settings.preprocessing_timeout
+        )
+        loop = asyncio.get_event_loop()
+        future = loop.run_in_executor(
+            None, self.preprocess_audio, wav_path, output_path
+        )
+        try:
+            timestamp_map, input_seconds, removed_seconds = await asyncio.wait_for(
+                asyncio.shield(future), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.error(
+                f"Silence trimming timed out after {timeout:.1f}s, "
+                "transcribing untrimmed audio"
+            )
+            record_stage_timeout("preprocessing")
+            # The thread cannot be stopped; remove its output once it finishes
+            def remove_output(_):
+                if os.path.exists(output_path):
+                    os.unlink(output_path)
+
+            future.add_done_callback(remove_output)
+        except Exception as e:
+            logger.error(
+                f"Silence trimming failed, transcribing untrimmed audio: {str(e)}"
+            )
+        else:
+            # Count the cut only now that the trimmed audio will be transcribed
+            percent = 100 * removed_seconds / input_seconds if input_seconds else 0.0
+            logger.info(
+                f"Silence trimming removed {removed_seconds:.1f}s of "
+                f"{input_seconds:.1f}s ({percent:.0f}%)"
+            )
+            self.preprocessing_stats["jobs"] += 1
+            self.preprocessing_stats["input_seconds"] += input_seconds
+            self.preprocessing_stats["removed_seconds"] += removed_seconds
+            return timestamp_map
+        return None
 
-    async def generate_report(self, transcript: str) -> Optional[str]:
+    def preprocess_audio(
+        self, wav_path: str, output_path: str
+    ) -> Tuple[TimestampMap, float, float]:
+        """Trim silence and normalize loudness of a WAV file
+
+        Writes the result to output_path. Returns the map from trimmed audio
+        times back to the original times, the input duration and the number
+        of seconds removed.
+        """
+        samples, sample_rate = read_wav(wav_path)
+        compacted, timestamp_map = compact_speech(
+            samples,
+            sample_rate,
+            threshold_margin_db=settings.silence_threshold_margin_db,
+            padding=settings.silence_padding,
+            max_pause=settings.silence_max_pause,
+        )
+        compacted = normalize_loudness(compacted, settings.loudness_target_dbfs)
+        write_wav(output_path, compacted, sample_rate)
+
+        input_seconds = len(samples) / sample_rate
+        removed_seconds = (len(samples) - len(compacted)) / sample_rate
+        return timestamp_map, input_seconds, removed_seconds
+
+    async def generate_report(
+        self, transcript: str, deadline: Optional[Deadline] = None
+    ) -> Optional[str]:
         """Generate a structured report from the transcript"""
+        deadline = deadline or Deadline(settings.job_deadline)
         try:
             logger.info("Starting report generation")
             # Use OpenAI service to generate the report
-            response = await self.openai_service.generate_report(transcript)
+            response = await self.openai_service.generate_report(
+                transcript, deadline.stage_timeout("report", settings.report_timeout)
+            )
             if not response:
                 logger.error("Failed to generate report using OpenAI")
                 return None
@@ -117,6 +249,8 @@ class AudioService:
             logger.info("Report generated successfully")
             return response
 
+        except StageTimeoutError:
+            raise
         except Exception as e:
             logger.error(f"Error generating report: {str(e)}")
             return None
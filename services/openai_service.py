@@ -1,6 +1,7 @@
 import logging
 from typing import Optional
-from openai import OpenAI
+from openai import AsyncOpenAI, APITimeoutError
+from utils.deadline import StageTimeoutError, record_stage_timeout
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,10 +13,12 @@ class OpenAIService:
 
     def __init__(self, api_key: str):
         """Initialize the OpenAI service"""
-        self.client = OpenAI(api_key=api_key)
+        self.client = AsyncOpenAI(api_key=api_key)
         logger.info("OpenAI service initialized")
 
-    async def generate_report(self, transcript: str) -> Optional[str]:
+    async def generate_report(
+        self, transcript: str, timeout: float = 120.0
+    ) -> Optional[str]:
         """Generate a structured report from the transcript"""
         try:
             logger.info("Generating report using OpenAI")
@@ -36,8 +39,11 @@ class OpenAIService:
             Format the report in a clear, professional manner suitable for healthcare providers.
             """
 
-            # Generate the report using OpenAI
-            response = self.client.chat.completions.create(
+            # Generate the report using OpenAI. The async client keeps the
+            # event loop free while the request is in flight, and retries are
+            # disabled so it cannot run past its share of the job deadline.
+            client = self.client.with_options(timeout=timeout, max_retries=0)
+            response = await client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
                     {
@@ -54,6 +60,10 @@ class OpenAIService:
             logger.info("Report generated successfully")
             return report
 
+        except APITimeoutError:
+            logger.error(f"Timed out generating report after {timeout}s")
+            record_stage_timeout("report")
+            raise StageTimeoutError("report", timeout)
         except Exception as e:
             logger.error(f"Error generating report with OpenAI: {str(e)}")
             return None
@@ -0,0 +1,409 @@
+import asyncio
+import logging
+import random
+import sqlite3
+import time
+from typing import Dict, List, Optional, Set, Tuple
+import requests
+from services.whatsapp_service import WhatsAppService
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# WhatsApp rejects text bodies longer than this
+MAX_MESSAGE_LENGTH = 4096
+# How often idle rate limit buckets are dropped, in seconds
+BUCKET_PRUNE_INTERVAL = 60.0
+PART_SEPARATOR = "\n\n"
+# Graph API error codes for throttling, usually returned with HTTP 400:
+# application rate limit, WABA rate limit, throughput limit, pair rate limit
+RATE_LIMIT_ERROR_CODES = {4, 80007, 130429, 131056}
+
+
+class TokenBucket:
+    """Token bucket rate limiter"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        self._refill()
+        self.tokens -= 1
+
+    def is_full(self) -> bool:
+        """Whether the bucket has refilled, making it equivalent to a new one"""
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+def _graph_error_code(response: requests.Response) -> Optional[int]:
+    try:
+        return response.json()["error"]["code"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def describe_error(error: Exception) -> str:
+    """Short description of a failed send, stored as the row's last error"""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        description = f"HTTP {error.response.status_code}"
+        code = _graph_error_code(error.response)
+        if code is not None:
+            description += f" (Graph API error {code})"
+        return description
+    return f"{type(error).__name__}: {error}"
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Whether a failed send will not succeed on retry
+
+    Client errors are permanent, except throttling, which the Graph API
+    reports as HTTP 429 or as a 400 with a rate limit error code.
+    """
+    if not isinstance(error, requests.HTTPError) or error.response is None:
+        return False
+    status_code = error.response.status_code
+    if not 400 <= status_code < 500 or status_code == 429:
+        return False
+    return _graph_error_code(error.response) not in RATE_LIMIT_ERROR_CODES
+
+
+def split_message(message: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Split a message into parts that fit in a single WhatsApp text message
+
+    Splits on paragraph, then line, then word boundaries where possible.
+    """
+    parts = []
+    while len(message) > limit:
+        cut = -1
+        for separator in ("\n\n", "\n", " "):
+            cut = message.rfind(separator, 0, limit)
+            if cut > 0:
+                break
+        if cut <= 0:
+            cut = limit
+        parts.append(message[:cut].rstrip())
+        message = message[cut:].lstrip()
+    if message:
+        parts.append(message)
+    return parts
+
+
+class OutboxService:
+    """Persistent, rate-limited queue for outgoing WhatsApp messages
+
+    Messages are stored in SQLite and drained by async sender tasks, so a slow
+    or throttled send never holds up the processing pipeline. Sends are rate
+    limited per phone number ID and per recipient, retried with exponential
+    backoff, and pending parts for the same recipient are batched into a
+    single message when they fit. Messages to a recipient are always delivered
+    in the order they were enqueued.
+    """
+
+    def __init__(
+        self,
+        whatsapp_service: WhatsAppService,
+        db_path: str = "outbox.db",
+        senders: int = 4,
+        phone_rate: float = 80.0,
+        phone_burst: float = 80.0,
+        recipient_rate: float = 1 / 6,
+        recipient_burst: float = 3.0,
+        max_attempts: int = 5,
+        base_backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        failed_retention: float = 7 * 24 * 3600,
+    ):
+        self.whatsapp_service = whatsapp_service
+        self.senders = senders
+        self.phone_rate = phone_rate
+        self.phone_burst = phone_burst
+        self.recipient_rate = recipient_rate
+        self.recipient_burst = recipient_burst
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.failed_retention = failed_retention
+
+        self._phone_buckets: Dict[str, TokenBucket] = {}
+        self._recipient_buckets: Dict[str, TokenBucket] = {}
+        self._buckets_pruned_at = time.monotonic()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        # Recipients a sender is currently serving
+        self._reserved: Set[str] = set()
+
+        self.db_path = db_path
+        self.db: Optional[sqlite3.Connection] = None
+
+    def open(self) -> None:
+        """Open the queue database, creating it if needed
+
+        Kept out of the constructor: the transcription worker's child process
+        re-imports main.py, and it must not touch the queue.
+        """
+        if self.db is not None:
+            return
+        self.db = sqlite3.connect(self.db_path, check_same_thread=False)
+        # Overwrite deleted message text on disk instead of leaving it in free pages
+        self.db.execute("PRAGMA secure_delete = ON")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                phone_number_id TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                body TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT
+            )
+            """
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS outbox_recipient ON outbox (recipient, status)"
+        )
+        # Messages claimed by a previous process that died mid-send
+        self.db.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'")
+        self.db.commit()
+        self.purge_failed()
+        logger.info("Outbox opened")
+
+    def enqueue(self, to: str, message: str) -> None:
+        """Queue a message for delivery, splitting it if it is too long"""
+        self.open()
+        recipient = WhatsAppService.format_phone_number(to)
+        now = time.time()
+        parts = split_message(message.strip())
+        self.db.executemany(
+            "INSERT INTO outbox (phone_number_id, recipient, body, next_attempt_at) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (self.whatsapp_service.phone_number_id, recipient, part, now)
+                for part in parts
+            ],
+        )
+        self.db.commit()
+        logger.info(f"Queued {len(parts)} message part(s) for {recipient}")
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Number of queued messages by status"""
+        if self.db is None:
+            return {}
+        rows = self.db.execute(
+            "SELECT status, COUNT(*) FROM outbox GROUP BY status"
+        ).fetchall()
+        return dict(rows)
+
+    def purge_failed(self) -> None:
+        """Delete failed messages older than the retention period
+
+        Failed messages keep only metadata and the last error, never the
+        message text; they are kept for a while so failures can be inspected.
+        """
+        self.db.execute(
+            "DELETE FROM outbox WHERE status = 'failed' AND next_attempt_at < ?",
+            (time.time() - self.failed_retention,),
+        )
+        # Rows that failed before message text was erased on give-up
+        self.db.execute(
+            "UPDATE outbox SET body = '' WHERE status = 'failed' AND body != ''"
+        )
+        self.db.commit()
+
+    def start(self) -> None:
+        """Start the sender tasks; must be called from the running event loop"""
+        self.open()
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.ensure_future(self._sender()) for _ in range(self.senders)
+        ]
+        logger.info(f"Started {self.senders} outbox sender(s)")
+
+    async def stop(self) -> None:
+        """Stop the sender tasks; undelivered messages stay queued"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.db is not None:
+            self.db.execute(
+                "UPDATE outbox SET status = 'pending' WHERE status = 'sending'"
+            )
+            self.db.commit()
+
+    def _next_recipient(self) -> Tuple[Optional[Tuple[str, str]], Optional[float]]:
+        """Pick the next recipient whose oldest undelivered part is due
+
+        Only a recipient's oldest undelivered part may start a batch, and only
+        when nothing else for that recipient is in flight or waiting for a
+        rate limit token, which keeps delivery in order. Returns the
+        (phone number ID, recipient) to serve, or None and the number of
+        seconds until one becomes due (None if nothing is eligible).
+        """
+        now = time.time()
+        next_due = None
+        for phone_number_id, recipient, due in self.db.execute(
+            """
+            SELECT o.phone_number_id, o.recipient, o.next_attempt_at FROM outbox o
+            WHERE o.status = 'pending'
+              AND o.id = (
+                  SELECT MIN(id) FROM outbox
+                  WHERE recipient = o.recipient AND status IN ('pending', 'sending')
+              )
+            ORDER BY o.id
+            """
+        ).fetchall():
+            if recipient in self._reserved:
+                continue
+            if due <= now:
+                return (phone_number_id, recipient), None
+            next_due = due if next_due is None else min(next_due, due)
+        return None, None if next_due is None else next_due - now
+
+    def _claim_batch(self, recipient: str) -> Tuple[List[int], str]:
+        """Mark a recipient's oldest pending parts as sending and combine them"""
+        ids, bodies, length = [], [], 0
+        for message_id, body in self.db.execute(
+            "SELECT id, body FROM outbox WHERE recipient = ? AND status = 'pending' "
+            "ORDER BY id",
+            (recipient,),
+        ):
+            added = len(body) + (len(PART_SEPARATOR) if bodies else 0)
+            if bodies and length + added > MAX_MESSAGE_LENGTH:
+                break
+            ids.append(message_id)
+            bodies.append(body)
+            length += added
+
+        self.db.executemany(
+            "UPDATE outbox SET status = 'sending' WHERE id = ?",
+            [(message_id,) for message_id in ids],
+        )
+        self.db.commit()
+        return ids, PART_SEPARATOR.join(bodies)
+
+    def _prune_buckets(self) -> None:
+        """Drop recipient buckets that have refilled and are not in use
+
+        A full bucket behaves exactly like a fresh one, so dropping it loses
+        no rate limiting state and keeps memory bounded by active recipients.
+        """
+        now = time.monotonic()
+        if now - self._buckets_pruned_at < BUCKET_PRUNE_INTERVAL:
+            return
+        self._buckets_pruned_at = now
+        for recipient in [
+            recipient
+            for recipient, bucket in self._recipient_buckets.items()
+            if recipient not in self._reserved and bucket.is_full()
+        ]:
+            del self._recipient_buckets[recipient]
+
+    async def _acquire(self, phone_number_id: str, recipient: str) -> None:
+        """Wait until both the phone number and the recipient have capacity"""
+        self._prune_buckets()
+        phone_bucket = self._phone_buckets.setdefault(
+            phone_number_id, TokenBucket(self.phone_rate, self.phone_burst)
+        )
+        recipient_bucket = self._recipient_buckets.setdefault(
+            recipient, TokenBucket(self.recipient_rate, self.recipient_burst)
+        )
+        while True:
+            wait = max(phone_bucket.wait_time(), recipient_bucket.wait_time())
+            if wait <= 0:
+                phone_bucket.consume()
+                recipient_bucket.consume()
+                return
+            await asyncio.sleep(wait)
+
+    async def _sender(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            head, wait = self._next_recipient()
+            if head is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            phone_number_id, recipient = head
+            self._reserved.add(recipient)
+            try:
+                await self._acquire(phone_number_id, recipient)
+                # Claim only once a token is held, so parts queued while
+                # waiting still join the batch
+                ids, body = self._claim_batch(recipient)
+                try:
+                    await loop.run_in_executor(
+                        None, self.whatsapp_service.send_message, recipient, body
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._record_failure(ids, e)
+                else:
+                    self.db.executemany(
+                        "DELETE FROM outbox WHERE id = ?", [(i,) for i in ids]
+                    )
+                    self.db.commit()
+                    logger.info(f"Delivered {len(ids)} queued part(s) to {recipient}")
+            finally:
+                self._reserved.discard(recipient)
+                # Later parts for this recipient may now be deliverable
+                self._wakeup.set()
+
+    def _record_failure(self, ids: List[int], error: Exception) -> None:
+        attempts = self.db.execute(
+            "SELECT MAX(attempts) FROM outbox WHERE id IN (%s)"
+            % ",".join("?" * len(ids)),
+            ids,
+        ).fetchone()[0] + 1
+
+        if is_permanent_error(error) or attempts >= self.max_attempts:
+            logger.error(
+                f"Giving up on {len(ids)} queued part(s) after {attempts} attempt(s): {error}"
+            )
+            # Message text may be health information; don't keep it once it
+            # will never be sent. next_attempt_at records when it failed.
+            self.db.executemany(
+                "UPDATE outbox SET status = 'failed', body = '', attempts = ?, "
+                "next_attempt_at = ?, last_error = ? WHERE id = ?",
+                [(attempts, time.time(), describe_error(error), i) for i in ids],
+            )
+            self.db.commit()
+            self.purge_failed()
+            return
+
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+        next_attempt_at = time.time() + backoff * random.uniform(0.5, 1.0)
+        logger.warning(
+            f"Send failed (attempt {attempts}), retrying in {backoff:.1f}s: {error}"
+        )
+        self.db.executemany(
+            "UPDATE outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, "
+            "last_error = ? WHERE id = ?",
+            [(attempts, next_attempt_at, describe_error(error), i) for i in ids],
+        )
+        self.db.commit()
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from typing import List, Tuple
+from utils.deadline import StageTimeoutError, record_stage_timeout
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (start seconds, end seconds, text)
+Segment = Tuple[float, float, str]
+
+
+def _worker_main(model_name: str, conn) -> None:
+    """Entry point of the worker process: load Whisper once, then serve jobs"""
+    import whisper
+
+    model = whisper.load_model(model_name)
+    conn.send(("ready", None))
+    while True:
+        try:
+            audio_path = conn.recv()
+        except EOFError:
+            break
+        if audio_path is None:
+            break
+        try:
+            result = model.transcribe(audio_path)
+            segments = [
+                (segment["start"], segment["end"], segment["text"])
+                for segment in result.get("segments", [])
+            ]
+            conn.send(("ok", (result["text"].strip(), segments)))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class TranscriptionWorker:
+    """Runs Whisper in a child process so a stuck transcription can be killed
+
+    Jobs are served one at a time. When a job exceeds its timeout the child is
+    terminated and a fresh one is started in its place; the replacement loads
+    the model in the background and picks up the next job once ready.
+
+    No process is started on construction: with the spawn start method the
+    child re-imports the main module, so the worker must not be started while
+    that module is being imported. Call start() from the app's startup event;
+    otherwise the first job starts the worker.
+    """
+
+    def __init__(self, model_name: str = "base"):
+        self.model_name = model_name
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._process = None
+        self._conn = None
+
+    def start(self, startup_timeout: float = 600.0) -> None:
+        """Start the worker process and wait for it to load the model"""
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                return
+            self._start()
+            self._wait_ready(startup_timeout)
+
+    def _start(self) -> None:
+        parent_conn, child_conn = self._ctx.Pipe()
+        self._process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.model_name, child_conn),
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        logger.info(f"Started transcription worker (pid {self._process.pid})")
+
+    def _wait_ready(self, timeout: float) -> None:
+        if not self._conn.poll(timeout):
+            self._stop()
+            raise RuntimeError(
+                f"Transcription worker did not load the Whisper model within {timeout}s"
+            )
+        try:
+            status, _ = self._conn.recv()
+        except EOFError:
+            self._process.join(5)
+            exitcode = self._process.exitcode
+            self._stop()
+            raise RuntimeError(
+                f"Transcription worker exited during startup (exit code {exitcode})"
+            )
+        if status != "ready":
+            self._stop()
+            raise RuntimeError(
+                f"Transcription worker failed to start: unexpected status {status!r}"
+            )
+        logger.info("Whisper model loaded in transcription worker")
+
+    def _stop(self) -> None:
+        if self._process is not None and self._process.is_alive():
+            self._process.terminate()
+            self._process.join(5)
+            if self._process.is_alive():
+                self._process.kill()
+                self._process.join()
+        if self._conn is not None:
+            self._conn.close()
+
+    def _restart(self) -> None:
+        if self._process is not None:
+            logger.warning(
+                f"Replacing transcription worker (pid {self._process.pid})"
+            )
+        self._stop()
+        self._start()
+
+    def _run(self, audio_path: str, timeout: float) -> Tuple[str, List[Segment]]:
+        deadline = time.monotonic() + timeout
+        if not self._lock.acquire(timeout=timeout):
+            record_stage_timeout("transcription")
+            raise StageTimeoutError("transcription", timeout)
+        try:
+            if self._process is None or not self._process.is_alive():
+                self._restart()
+            self._conn.send(audio_path)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._conn.poll(remaining):
+                    record_stage_timeout("transcription")
+                    self._restart()
+                    raise StageTimeoutError("transcription", timeout)
+                try:
+                    status, payload = self._conn.recv()
+                except EOFError:
+                    self._restart()
+                    raise RuntimeError("Transcription worker exited unexpectedly")
+                if status == "ready":
+                    # A replacement worker finished loading the model
+                    continue
+                if status == "error":
+                    raise RuntimeError(payload)
+                return payload
+        finally:
+            self._lock.release()
+
+    async def transcribe(
+        self, audio_path: str, timeout: float
+    ) -> Tuple[str, List[Segment]]:
+        """Transcribe a 16kHz mono WAV file, killing the worker if it overruns
+
+        Returns the transcript text and its (start, end, text) segments.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, self._run, audio_path, timeout)
+
+    def close(self) -> None:
+        """Stop the worker process"""
+        if self._process is None:
+            return
+        if self._conn is not None and self._process.is_alive():
+            try:
+                self._conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self._process.join(5)
+        self._stop()
@@ -1,7 +1,11 @@
 import requests
 import logging
 import json
+import socket
+import time
 from typing import Dict, Any, Optional
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+from utils.deadline import StageTimeoutError, record_stage_timeout
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,11 +16,16 @@ class WhatsAppService:
     """Service for handling WhatsApp message operations"""
 
     def __init__(
-        self, api_token: str, phone_number_id: str, api_version: str = "v21.0"
+        self,
+        api_token: str,
+        phone_number_id: str,
+        api_version: str = "v21.0",
+        timeout: float = 30.0,
     ):
         self.api_token = api_token
         self.phone_number_id = phone_number_id
         self.api_version = api_version
+        self.timeout = timeout
         self.api_url = (
             f"https://graph.facebook.com/{api_version}/{phone_number_id}/messages"
         )
@@ -33,8 +42,11 @@ class WhatsAppService:
 
         return phone
 
-    def send_message(self, to: str, message: str) -> Dict[str, Any]:
+    def send_message(
+        self, to: str, message: str, timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
         """Send a message using WhatsApp Business API"""
+        timeout = self.timeout if timeout is None else timeout
         headers = {
             "Authorization": f"Bearer {self.api_token}",
             "Content-Type": "application/json",
@@ -58,7 +70,9 @@ class WhatsAppService:
             logger.info(f"Request URL: {self.api_url}")
             logger.info(f"Request data: {json.dumps(data, indent=2)}")
 
-            response = requests.post(self.api_url, headers=headers, json=data)
+            response = requests.post(
+                self.api_url, headers=headers, json=data, timeout=timeout
+            )
             logger.info(f"Response status code: {response.status_code}")
             logger.info(f"Response body: {response.text}")
 
@@ -69,33 +83,87 @@ class WhatsAppService:
             response.raise_for_status()
 
             return response.json()
+        except requests.Timeout:
+            logger.error(f"Timed out sending WhatsApp message after {timeout}s")
+            record_stage_timeout("send")
+            raise StageTimeoutError("send", timeout)
         except Exception as e:
             logger.error(f"Error sending WhatsApp message: {str(e)}")
             raise
 
     @staticmethod
-    def get_media_url(media_id: str, api_token: str, api_version: str) -> Optional[str]:
+    def get_media_url(
+        media_id: str, api_token: str, api_version: str, timeout: float = 15.0
+    ) -> Optional[str]:
         """Get media URL from WhatsApp API"""
         try:
             headers = {"Authorization": f"Bearer {api_token}"}
             response = requests.get(
                 f"https://graph.facebook.com/{api_version}/{media_id}",
                 headers=headers,
+                timeout=timeout,
             )
             response.raise_for_status()
             return response.json().get("url")
+        except requests.Timeout:
+            logger.error(f"Timed out getting media URL after {timeout}s")
+            record_stage_timeout("media_url")
+            raise StageTimeoutError("media_url", timeout)
         except Exception as e:
             logger.error(f"Error getting media URL: {str(e)}")
             return None
 
     @staticmethod
-    def download_media(url: str, api_token: str) -> Optional[bytes]:
-        """Download media content from WhatsApp URL"""
+    def _set_read_timeout(response: requests.Response, seconds: float) -> None:
+        """Limit the next socket read of a streamed response"""
+        connection = getattr(response.raw, "_connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock is not None:
+            sock.settimeout(max(0.1, seconds))
+
+    @staticmethod
+    def download_media(
+        url: str, api_token: str, timeout: float = 120.0
+    ) -> Optional[bytes]:
+        """Download media content from WhatsApp URL
+
+        The timeout covers the whole download, not just each socket read: every
+        read is limited to the time left, so a slow trickle of bytes or a
+        stalled connection cannot hold the worker past its deadline.
+        """
         try:
             headers = {"Authorization": f"Bearer {api_token}"}
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            return response.content
+            deadline = time.monotonic() + timeout
+            with requests.get(
+                url, headers=headers, timeout=timeout, stream=True
+            ) as response:
+                response.raise_for_status()
+                # read1 returns after a single socket read (urllib3 2), so
+                # each read is bounded by the timeout set just before it
+                read = getattr(response.raw, "read1", response.raw.read)
+                chunks = []
+                try:
+                    while True:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise requests.Timeout("Download exceeded deadline")
+                        WhatsAppService._set_read_timeout(response, remaining)
+                        chunk = read(64 * 1024, decode_content=True)
+                        if not chunk:
+                            break
+                        chunks.append(chunk)
+                except (ReadTimeoutError, socket.timeout) as e:
+                    raise requests.Timeout(str(e))
+                except ProtocolError as e:
+                    # urllib3 may wrap a timed out read in a ProtocolError
+                    if isinstance(e.__context__, (ReadTimeoutError, socket.timeout)):
+                        raise requests.Timeout(str(e))
+                    raise
+                return b"".join(chunks)
+        except requests.Timeout:
+            logger.error(f"Timed out downloading media after {timeout}s")
+            record_stage_timeout("download")
+            raise StageTimeoutError("download", timeout)
         except Exception as e:
             logger.error(f"Error downloading media: {str(e)}")
             return None
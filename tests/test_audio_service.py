@@ -0,0 +1,64 @@
+import asyncio
+import time
+import pytest
+from services import audio_service
+from services.audio_service import AudioService
+from utils.audio_utils import TimestampMap
+from utils.deadline import Deadline
+
+
+def make_service():
+    # Skip __init__: it builds the Whisper worker and the OpenAI client
+    service = AudioService.__new__(AudioService)
+    service.preprocessing_stats = {
+        "jobs": 0,
+        "input_seconds": 0.0,
+        "removed_seconds": 0.0,
+    }
+    return service
+
+
+@pytest.mark.asyncio
+async def test_preprocessing_records_stats_when_trimmed_audio_is_used(
+    monkeypatch, tmp_path
+):
+    service = make_service()
+    timestamp_map = TimestampMap()
+    monkeypatch.setattr(
+        service,
+        "preprocess_audio",
+        lambda wav_path, output_path: (timestamp_map, 10.0, 4.0),
+    )
+
+    result = await service._run_preprocessing(
+        "in.wav", str(tmp_path / "out.wav"), Deadline(60)
+    )
+
+    assert result is timestamp_map
+    assert service.preprocessing_stats == {
+        "jobs": 1,
+        "input_seconds": 10.0,
+        "removed_seconds": 4.0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_preprocessing_overrun_records_no_stats(monkeypatch, tmp_path):
+    service = make_service()
+    monkeypatch.setattr(audio_service.settings, "preprocessing_timeout", 0.1)
+
+    def slow_preprocess(wav_path, output_path):
+        time.sleep(0.3)
+        return TimestampMap(), 10.0, 4.0
+
+    monkeypatch.setattr(service, "preprocess_audio", slow_preprocess)
+
+    result = await service._run_preprocessing(
+        "in.wav", str(tmp_path / "out.wav"), Deadline(60)
+    )
+    # Let the abandoned run finish
+    await asyncio.sleep(0.4)
+
+    assert result is None
+    assert service.preprocessing_stats["jobs"] == 0
+    assert service.preprocessing_stats["removed_seconds"] == 0.0
@@ -0,0 +1,78 @@
+import numpy as np
+from utils.audio_utils import TimestampMap, compact_speech, normalize_loudness
+
+SAMPLE_RATE = 16000
+
+
+def tone(seconds: float, dbfs: float, frequency: float = 220.0) -> np.ndarray:
+    """A sine at the given RMS level, standing in for a voice"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    amplitude = 10 ** (dbfs / 20) * np.sqrt(2) * 32768
+    return (np.sin(2 * np.pi * frequency * t) * amplitude).astype(np.int16)
+
+
+def noise(seconds: float, dbfs: float = -60.0, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    scale = 10 ** (dbfs / 20) * 32768
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * scale).astype(np.int16)
+
+
+def test_compact_speech_drops_edges_and_shortens_pauses():
+    audio = np.concatenate(
+        [noise(3), tone(2, -20), noise(0.3), tone(1, -20), noise(5), tone(2, -20), noise(4)]
+    )
+    compacted, timestamp_map = compact_speech(audio, SAMPLE_RATE)
+
+    # 5s of speech, a kept 0.3s pause, a 5s pause cut to 0.5s, plus padding
+    assert 5.5 <= len(compacted) / SAMPLE_RATE <= 6.8
+    assert len(timestamp_map.segments) == 2
+
+
+def test_compact_speech_keeps_quieter_second_speaker():
+    # Two speakers taking 3s turns with no silence, the second 12dB quieter
+    turns = [tone(3, -8, 220) if i % 2 == 0 else tone(3, -20, 180) for i in range(20)]
+    audio = np.concatenate([noise(2)] + turns + [noise(2)])
+    speech_seconds = 60.0
+
+    compacted, _ = compact_speech(audio, SAMPLE_RATE)
+
+    assert len(compacted) / SAMPLE_RATE >= speech_seconds
+
+
+def test_compact_speech_leaves_silent_audio_alone():
+    audio = noise(5)
+    compacted, timestamp_map = compact_speech(audio, SAMPLE_RATE)
+
+    assert len(compacted) == len(audio)
+    assert timestamp_map.to_original(2.5) == 2.5
+
+
+def test_timestamp_map_converts_to_original_times():
+    timestamp_map = TimestampMap()
+    timestamp_map.add(0.0, 3.0, 4.0)
+    timestamp_map.add(4.0, 10.0, 2.0)
+
+    assert timestamp_map.to_original(0.0) == 3.0
+    assert timestamp_map.to_original(3.5) == 6.5
+    assert timestamp_map.to_original(4.5) == 10.5
+    # Past the end of the last region clamps to its end
+    assert timestamp_map.to_original(9.0) == 12.0
+
+
+def test_compact_speech_timestamps_point_at_speech():
+    audio = np.concatenate([noise(3), tone(2, -20), noise(5), tone(2, -20)])
+    _, timestamp_map = compact_speech(audio, SAMPLE_RATE)
+
+    # Second region starts 0.25s (half the kept pause) plus padding before
+    # the second tone at 10s
+    second_compacted_start = timestamp_map.segments[1][0]
+    assert abs(timestamp_map.to_original(second_compacted_start) - 10.0) < 0.5
+
+
+def test_normalize_loudness_reaches_target_without_clipping():
+    quiet = tone(2, -35)
+    normalized = normalize_loudness(quiet, target_dbfs=-20.0)
+
+    rms = np.sqrt(np.mean((normalized / 32768.0) ** 2))
+    assert abs(20 * np.log10(rms) + 20.0) < 0.5
+    assert np.abs(normalized).max() < 32767
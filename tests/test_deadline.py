@@ -0,0 +1,59 @@
+import subprocess
+import time
+import pytest
+from utils.deadline import (
+    Deadline,
+    StageTimeoutError,
+    get_stage_timeouts,
+    run_subprocess,
+)
+
+
+def test_stage_timeout_uses_stage_cap_when_budget_allows():
+    deadline = Deadline(100)
+
+    assert deadline.stage_timeout("download", 10) == 10
+
+
+def test_stage_timeout_is_bounded_by_remaining_budget():
+    deadline = Deadline(5)
+
+    assert deadline.stage_timeout("transcription", 60) <= 5
+
+
+def test_stage_timeout_without_cap_returns_remaining_budget():
+    deadline = Deadline(5)
+
+    assert 4 < deadline.stage_timeout("report") <= 5
+
+
+def test_stage_timeout_raises_and_counts_when_budget_spent():
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+    before = get_stage_timeouts().get("test_stage", 0)
+
+    assert deadline.expired()
+    with pytest.raises(StageTimeoutError) as excinfo:
+        deadline.stage_timeout("test_stage", 10)
+
+    assert excinfo.value.stage == "test_stage"
+    assert get_stage_timeouts()["test_stage"] == before + 1
+
+
+@pytest.mark.asyncio
+async def test_run_subprocess_kills_child_on_timeout():
+    before = get_stage_timeouts().get("conversion", 0)
+    started = time.monotonic()
+
+    with pytest.raises(StageTimeoutError) as excinfo:
+        await run_subprocess(["sleep", "10"], "conversion", 0.2)
+
+    assert time.monotonic() - started < 5
+    assert excinfo.value.stage == "conversion"
+    assert get_stage_timeouts()["conversion"] == before + 1
+
+
+@pytest.mark.asyncio
+async def test_run_subprocess_raises_on_failed_exit():
+    with pytest.raises(subprocess.CalledProcessError):
+        await run_subprocess(["false"], "conversion", 5)
@@ -0,0 +1,91 @@
+import importlib
+import json
+import pytest
+from fastapi.testclient import TestClient
+from config import settings
+from utils.deadline import StageTimeoutError
+
+AUDIO_WEBHOOK = {
+    "entry": [
+        {
+            "changes": [
+                {
+                    "field": "messages",
+                    "value": {
+                        "messages": [
+                            {
+                                "from": "15550001111",
+                                "type": "audio",
+                                "audio": {"id": "media-1", "mime_type": "audio/ogg"},
+                            }
+                        ]
+                    },
+                }
+            ]
+        }
+    ]
+}
+
+
+class FakeOutbox:
+    def __init__(self):
+        self.enqueued = []
+
+    def enqueue(self, to, message):
+        self.enqueued.append((to, message))
+
+
+@pytest.fixture
+def main(monkeypatch, tmp_path):
+    # main writes chatbot.log to the working directory on import
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(settings, "openai_api_key", "test-key")
+    monkeypatch.setattr(settings, "whatsapp_app_secret", "")
+    module = importlib.import_module("main")
+    monkeypatch.setattr(module, "outbox", FakeOutbox())
+    monkeypatch.setattr(
+        module.WhatsAppService,
+        "get_media_url",
+        staticmethod(lambda *args, **kwargs: "https://media.example/1"),
+    )
+    monkeypatch.setattr(
+        module.WhatsAppService,
+        "download_media",
+        staticmethod(lambda *args, **kwargs: b"audio"),
+    )
+    return module
+
+
+def test_webhook_tells_user_when_a_stage_times_out(main, monkeypatch):
+    async def transcribe_audio(audio_data, file_type, deadline):
+        raise StageTimeoutError("transcription", 1500)
+
+    monkeypatch.setattr(main.audio_service, "transcribe_audio", transcribe_audio)
+
+    response = TestClient(main.app).post(
+        "/webhook", content=json.dumps(AUDIO_WEBHOOK)
+    )
+
+    assert response.json()["status"] == "error"
+    to, message = main.outbox.enqueued[-1]
+    assert to == "15550001111"
+    assert message.startswith("Sorry, transcribing your audio took too long")
+
+
+def test_webhook_tells_user_when_download_times_out(main, monkeypatch):
+    def download_media(*args, **kwargs):
+        raise StageTimeoutError("download", 120)
+
+    monkeypatch.setattr(
+        main.WhatsAppService, "download_media", staticmethod(download_media)
+    )
+
+    TestClient(main.app).post("/webhook", content=json.dumps(AUDIO_WEBHOOK))
+
+    assert main.outbox.enqueued == [
+        (
+            "15550001111",
+            "Sorry, downloading your audio took too long and was stopped. "
+            "Please try again later, or send a shorter recording.",
+        )
+    ]
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import time
+import pytest
+import requests
+from services.outbox_service import (
+    MAX_MESSAGE_LENGTH,
+    OutboxService,
+    TokenBucket,
+    split_message,
+)
+
+
+class FakeWhatsAppService:
+    phone_number_id = "phone-1"
+
+    def __init__(self, failures=0, delay=0.0):
+        self.sent = []
+        self.failures = failures
+        self.delay = delay
+
+    def send_message(self, to, message):
+        time.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("send failed")
+        self.sent.append((to, message))
+        return {}
+
+
+def make_outbox(**kwargs):
+    kwargs.setdefault("recipient_burst", 100)
+    outbox = OutboxService(FakeWhatsAppService(), db_path=":memory:", **kwargs)
+    outbox.open()
+    return outbox
+
+
+def test_constructor_does_not_touch_database(tmp_path):
+    db_path = tmp_path / "outbox.db"
+    OutboxService(FakeWhatsAppService(), db_path=str(db_path))
+
+    assert not db_path.exists()
+
+
+def test_open_recovers_messages_left_sending(tmp_path):
+    db_path = str(tmp_path / "outbox.db")
+    crashed = OutboxService(FakeWhatsAppService(), db_path=db_path)
+    crashed.enqueue("1555", "report")
+    crashed._claim_batch("+1555")
+
+    restarted = OutboxService(FakeWhatsAppService(), db_path=db_path)
+    restarted.open()
+
+    assert restarted.stats() == {"pending": 1}
+
+
+def test_token_bucket_allows_burst_then_waits():
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    bucket.consume()
+    bucket.consume()
+
+    assert 0.9 < bucket.wait_time() <= 1.0
+    assert not bucket.is_full()
+
+
+def test_split_message_keeps_short_messages_whole():
+    assert split_message("hello") == ["hello"]
+
+
+def test_split_message_splits_on_paragraphs_within_limit():
+    paragraph = "word " * 500
+    message = "\n\n".join([paragraph.strip()] * 5)
+    parts = split_message(message)
+
+    assert len(parts) > 1
+    assert all(len(part) <= MAX_MESSAGE_LENGTH for part in parts)
+    assert " ".join(parts).split() == message.split()
+
+
+def test_split_message_hard_splits_unbroken_text():
+    parts = split_message("x" * 5000)
+
+    assert [len(part) for part in parts] == [MAX_MESSAGE_LENGTH, 5000 - MAX_MESSAGE_LENGTH]
+
+
+def test_claim_batch_combines_parts_in_order():
+    outbox = make_outbox()
+    outbox.enqueue("1555", "notice")
+    outbox.enqueue("1555", "report")
+
+    head, _ = outbox._next_recipient()
+    ids, body = outbox._claim_batch(head[1])
+
+    assert head == ("phone-1", "+1555")
+    assert len(ids) == 2
+    assert body == "notice\n\nreport"
+
+
+def test_claim_batch_stops_at_message_limit():
+    outbox = make_outbox()
+    outbox.enqueue("1555", "a" * 3000)
+    outbox.enqueue("1555", "b" * 3000)
+
+    ids, body = outbox._claim_batch("+1555")
+
+    assert len(ids) == 1
+    assert body == "a" * 3000
+
+
+def test_next_recipient_skips_recipient_in_flight_without_spinning():
+    outbox = make_outbox()
+    outbox.enqueue("1555", "x" * 5000)  # Two parts
+    outbox._claim_batch("+1555")
+
+    # The second part must wait for the first, and no wait time is offered
+    # for it, so an idle sender sleeps until woken instead of spinning
+    assert outbox._next_recipient() == (None, None)
+
+
+def test_next_recipient_skips_reserved_recipient():
+    outbox = make_outbox()
+    outbox.enqueue("1555", "first")
+    outbox.enqueue("1666", "second")
+    outbox._reserved.add("+1555")
+
+    head, _ = outbox._next_recipient()
+
+    assert head == ("phone-1", "+1666")
+
+
+def test_next_recipient_reports_wait_until_retry_is_due():
+    outbox = make_outbox(base_backoff=10.0)
+    outbox.enqueue("1555", "report")
+    ids, _ = outbox._claim_batch("+1555")
+    outbox._record_failure(ids, RuntimeError("timeout"))
+
+    head, wait = outbox._next_recipient()
+
+    assert head is None
+    assert 4 < wait <= 10
+
+
+def test_record_failure_gives_up_on_client_errors():
+    outbox = make_outbox()
+    outbox.enqueue("1555", "report")
+    ids, _ = outbox._claim_batch("+1555")
+    response = requests.Response()
+    response.status_code = 400
+
+    outbox._record_failure(ids, requests.HTTPError(response=response))
+
+    assert outbox.stats() == {"failed": 1}
+
+
+def graph_error(status_code, code):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(
+        {"error": {"message": "error", "type": "OAuthException", "code": code}}
+    ).encode()
+    return requests.HTTPError(response=response)
+
+
+def test_record_failure_retries_graph_api_throttling():
+    outbox = make_outbox()
+    outbox.enqueue("1555", "report")
+    ids, _ = outbox._claim_batch("+1555")
+
+    outbox._record_failure(ids, graph_error(400, 131056))
+
+    assert outbox.stats() == {"pending": 1}
+
+
+def test_record_failure_gives_up_on_other_graph_api_errors():
+    outbox = make_outbox()
+    outbox.enqueue("1555", "report")
+    ids, _ = outbox._claim_batch("+1555")
+
+    # Recipient phone number not in allowed list
+    outbox._record_failure(ids, graph_error(400, 131030))
+
+    assert outbox.stats() == {"failed": 1}
+
+
+def test_record_failure_erases_text_of_failed_messages():
+    outbox = make_outbox()
+    outbox.enqueue("1555", "report")
+    ids, _ = outbox._claim_batch("+1555")
+
+    outbox._record_failure(ids, graph_error(400, 131030))
+
+    body, last_error = outbox.db.execute(
+        "SELECT body, last_error FROM outbox"
+    ).fetchone()
+    assert body == ""
+    assert last_error == "HTTP 400 (Graph API error 131030)"
+
+
+def test_purge_failed_deletes_old_failures_only():
+    outbox = make_outbox(failed_retention=60)
+    outbox.enqueue("1555", "old")
+    outbox.enqueue("1666", "recent")
+    for recipient in ("+1555", "+1666"):
+        ids, _ = outbox._claim_batch(recipient)
+        outbox._record_failure(ids, graph_error(400, 131030))
+    outbox.db.execute(
+        "UPDATE outbox SET next_attempt_at = ? WHERE recipient = '+1555'",
+        (time.time() - 120,),
+    )
+
+    outbox.purge_failed()
+
+    rows = outbox.db.execute("SELECT recipient FROM outbox").fetchall()
+    assert rows == [("+1666",)]
+
+
+def test_record_failure_gives_up_after_max_attempts():
+    outbox = make_outbox(max_attempts=2, base_backoff=0.0)
+    outbox.enqueue("1555", "report")
+    for _ in range(2):
+        ids, _ = outbox._claim_batch("+1555")
+        outbox._record_failure(ids, RuntimeError("timeout"))
+
+    assert outbox.stats() == {"failed": 1}
+
+
+@pytest.mark.asyncio
+async def test_prune_buckets_drops_full_idle_buckets():
+    outbox = make_outbox(recipient_rate=1000.0)
+    for recipient in ("+1", "+2", "+3"):
+        await outbox._acquire("phone-1", recipient)
+    await asyncio.sleep(0.01)
+    outbox._buckets_pruned_at -= 120
+
+    outbox._prune_buckets()
+
+    assert outbox._recipient_buckets == {}
+
+
+@pytest.mark.asyncio
+async def test_senders_deliver_in_order_and_retry():
+    outbox = make_outbox(senders=3, base_backoff=0.05)
+    outbox.whatsapp_service = FakeWhatsAppService(failures=1, delay=0.01)
+    outbox.start()
+    try:
+        outbox.enqueue("1555", "notice")
+        outbox.enqueue("1555", "a" * 4000 + "\n\n" + "b" * 4000)
+        outbox.enqueue("1666", "help")
+        for _ in range(100):
+            if not outbox.stats():
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await outbox.stop()
+
+    sent = outbox.whatsapp_service.sent
+    to_first = [message for to, message in sent if to == "+1555"]
+    assert to_first == ["notice\n\n" + "a" * 4000, "b" * 4000]
+    assert ("+1666", "help") in sent
+    assert outbox.stats() == {}
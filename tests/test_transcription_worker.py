@@ -0,0 +1,56 @@
+import pytest
+from services.transcription_worker import TranscriptionWorker
+from utils.deadline import StageTimeoutError, get_stage_timeouts
+
+# Stands in for the whisper package in the worker process: a "hang" path
+# never finishes, anything else transcribes instantly
+STUB_WHISPER = '''
+import time
+
+
+class Model:
+    def transcribe(self, audio_path):
+        if audio_path == "hang":
+            time.sleep(60)
+        return {
+            "text": " hello ",
+            "segments": [{"start": 0.0, "end": 1.0, "text": "hello"}],
+        }
+
+
+def load_model(name):
+    return Model()
+'''
+
+
+@pytest.fixture
+def worker(monkeypatch, tmp_path):
+    (tmp_path / "whisper.py").write_text(STUB_WHISPER)
+    # Spawned children inherit the parent's sys.path
+    monkeypatch.syspath_prepend(str(tmp_path))
+    worker = TranscriptionWorker("stub")
+    yield worker
+    worker.close()
+
+
+def test_worker_transcribes(worker):
+    worker.start(startup_timeout=30)
+
+    assert worker._run("clip.wav", 30) == ("hello", [(0.0, 1.0, "hello")])
+
+
+def test_worker_replaced_after_timeout(worker):
+    worker.start(startup_timeout=30)
+    stuck = worker._process
+    before = get_stage_timeouts().get("transcription", 0)
+
+    with pytest.raises(StageTimeoutError) as excinfo:
+        worker._run("hang", 0.5)
+
+    assert excinfo.value.stage == "transcription"
+    assert get_stage_timeouts()["transcription"] == before + 1
+    assert not stuck.is_alive()
+    assert worker._process is not stuck
+
+    # The replacement announces itself with "ready" before the next result
+    assert worker._run("clip.wav", 30) == ("hello", [(0.0, 1.0, "hello")])
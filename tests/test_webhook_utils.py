@@ -0,0 +1,98 @@
+import hashlib
+import hmac
+import json
+from utils.webhook_utils import is_status_only, parse_webhook, verify_signature
+
+APP_SECRET = "test-secret"
+
+
+def sign(body: bytes) -> str:
+    return "sha256=" + hmac.new(APP_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def delivery(value: dict) -> bytes:
+    return json.dumps(
+        {
+            "object": "whatsapp_business_account",
+            "entry": [{"id": "1", "changes": [{"value": value, "field": "messages"}]}],
+        }
+    ).encode()
+
+
+STATUS_BODY = delivery(
+    {"statuses": [{"id": "wamid.1", "status": "read", "recipient_id": "123"}]}
+)
+AUDIO_BODY = delivery(
+    {
+        "messages": [
+            {
+                "from": "15551234",
+                "type": "audio",
+                "audio": {"id": "media-1", "mime_type": "audio/ogg"},
+            }
+        ]
+    }
+)
+
+
+def test_verify_signature_accepts_valid_signature():
+    assert verify_signature(STATUS_BODY, sign(STATUS_BODY), APP_SECRET)
+
+
+def test_verify_signature_rejects_tampered_body():
+    assert not verify_signature(STATUS_BODY + b" ", sign(STATUS_BODY), APP_SECRET)
+
+
+def test_verify_signature_rejects_missing_or_malformed_header():
+    assert not verify_signature(STATUS_BODY, None, APP_SECRET)
+    assert not verify_signature(STATUS_BODY, "", APP_SECRET)
+    assert not verify_signature(STATUS_BODY, sign(STATUS_BODY)[7:], APP_SECRET)
+
+
+def test_verify_signature_rejects_non_ascii_header():
+    # Starlette decodes header values as latin-1
+    assert not verify_signature(STATUS_BODY, "sha256=é", APP_SECRET)
+
+
+def test_is_status_only_despite_field_messages_value():
+    # Every delivery carries "field": "messages", status updates included
+    assert b'"messages"' in STATUS_BODY
+    assert is_status_only(STATUS_BODY)
+
+
+def test_is_status_only_false_for_messages():
+    assert not is_status_only(AUDIO_BODY)
+    mixed = delivery({"statuses": [{"id": "1"}], "messages": [{"from": "1"}]})
+    assert not is_status_only(mixed)
+
+
+def test_is_status_only_ignores_escaped_key_in_text():
+    body = delivery({"statuses": [{"id": "1", "note": '"messages": []'}]})
+    assert is_status_only(body)
+
+
+def test_parse_webhook_extracts_audio_message():
+    envelope = parse_webhook(AUDIO_BODY)
+
+    assert not envelope.has_statuses
+    message = envelope.messages[0]
+    assert message.sender == "15551234"
+    assert message.type == "audio"
+    assert message.media == {"id": "media-1", "mime_type": "audio/ogg"}
+
+
+def test_parse_webhook_extracts_text_message():
+    body = delivery(
+        {"messages": [{"from": "1", "type": "text", "text": {"body": "help"}}]}
+    )
+    message = parse_webhook(body).messages[0]
+
+    assert message.text == "help"
+    assert message.media == {}
+
+
+def test_parse_webhook_status_only():
+    envelope = parse_webhook(STATUS_BODY)
+
+    assert envelope.has_statuses
+    assert envelope.messages == []
@@ -0,0 +1,62 @@
+import socket
+import threading
+import time
+import pytest
+from services.whatsapp_service import WhatsAppService
+from utils.deadline import StageTimeoutError, get_stage_timeouts
+
+
+def serve_once(body_writer):
+    """Serve one HTTP response on a local port; body_writer sends the body"""
+    server = socket.socket()
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def handle():
+        conn, _ = server.accept()
+        try:
+            conn.recv(65536)
+            conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 100000\r\n\r\n")
+            body_writer(conn)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+            server.close()
+
+    threading.Thread(target=handle, daemon=True).start()
+    return f"http://127.0.0.1:{server.getsockname()[1]}/media"
+
+
+def stall(conn):
+    conn.sendall(b"x" * 1000)
+    time.sleep(5)
+
+
+def trickle(conn):
+    # Each byte arrives well within a per-read timeout, so only a cutoff on
+    # the whole download can stop it
+    for _ in range(50):
+        conn.sendall(b"y")
+        time.sleep(0.1)
+
+
+@pytest.mark.parametrize("body_writer", [stall, trickle])
+def test_download_media_stops_at_total_timeout(body_writer):
+    url = serve_once(body_writer)
+    before = get_stage_timeouts().get("download", 0)
+    started = time.monotonic()
+
+    with pytest.raises(StageTimeoutError) as excinfo:
+        WhatsAppService.download_media(url, "token", timeout=1.0)
+
+    assert time.monotonic() - started < 2.0
+    assert excinfo.value.stage == "download"
+    assert get_stage_timeouts()["download"] == before + 1
+
+
+def test_download_media_returns_body():
+    url = serve_once(lambda conn: conn.sendall(b"z" * 100000))
+
+    assert WhatsAppService.download_media(url, "token", timeout=5.0) == b"z" * 100000
@@ -0,0 +1,140 @@
+import wave
+from typing import List, Tuple
+import numpy as np
+
+
+def read_wav(path: str) -> Tuple[np.ndarray, int]:
+    """Read a 16-bit mono WAV file into an int16 array"""
+    with wave.open(path, "rb") as wav_file:
+        sample_rate = wav_file.getframerate()
+        frames = wav_file.readframes(wav_file.getnframes())
+    return np.frombuffer(frames, dtype=np.int16), sample_rate
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int) -> None:
+    """Write an int16 array as a 16-bit mono WAV file"""
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(samples.astype(np.int16).tobytes())
+
+
+class TimestampMap:
+    """Maps times in compacted audio back to times in the original recording"""
+
+    def __init__(self):
+        # (compacted start, original start, duration) for each kept region
+        self.segments: List[Tuple[float, float, float]] = []
+
+    def add(self, compacted_start: float, original_start: float, duration: float):
+        self.segments.append((compacted_start, original_start, duration))
+
+    def to_original(self, t: float) -> float:
+        """Convert a time in the compacted audio to the original timeline"""
+        for compacted_start, original_start, duration in reversed(self.segments):
+            if t >= compacted_start:
+                return original_start + min(t - compacted_start, duration)
+        return t
+
+
+def _frame_levels(samples: np.ndarray, frame_size: int) -> np.ndarray:
+    """RMS level of each frame in dBFS"""
+    frame_count = len(samples) // frame_size
+    frames = samples[: frame_count * frame_size].astype(np.float32) / 32768.0
+    frames = frames.reshape(frame_count, frame_size)
+    rms = np.sqrt(np.mean(frames**2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def compact_speech(
+    samples: np.ndarray,
+    sample_rate: int,
+    frame_ms: int = 30,
+    threshold_margin_db: float = 12.0,
+    min_threshold_dbfs: float = -50.0,
+    max_noise_floor_dbfs: float = -50.0,
+    padding: float = 0.2,
+    max_pause: float = 0.5,
+) -> Tuple[np.ndarray, TimestampMap]:
+    """Drop leading/trailing silence and shorten long pauses
+
+    A frame counts as speech when its level is at least `threshold_margin_db`
+    above the recording's noise floor (and above `min_threshold_dbfs`). The
+    floor is taken from the quietest frames and capped at
+    `max_noise_floor_dbfs`, so a recording with little or no silence cannot
+    raise it to the level of a quieter speaker. Speech
+    regions are padded on both sides, pauses longer than `max_pause` are cut
+    down to `max_pause`, and audio before the first and after the last speech
+    region is removed.
+    """
+    frame_size = int(sample_rate * frame_ms / 1000)
+    timestamp_map = TimestampMap()
+    if len(samples) < frame_size:
+        timestamp_map.add(0.0, 0.0, len(samples) / sample_rate)
+        return samples, timestamp_map
+
+    levels = _frame_levels(samples, frame_size)
+    noise_floor = min(float(np.percentile(levels, 1)), max_noise_floor_dbfs)
+    threshold = max(noise_floor + threshold_margin_db, min_threshold_dbfs)
+    speech = levels > threshold
+
+    if not speech.any():
+        # Nothing looks like speech; leave the audio alone rather than
+        # handing Whisper an empty file
+        timestamp_map.add(0.0, 0.0, len(samples) / sample_rate)
+        return samples, timestamp_map
+
+    # Pad speech regions so word onsets and tails are not clipped
+    pad_frames = int(padding * 1000 / frame_ms)
+    if pad_frames:
+        kernel = np.ones(2 * pad_frames + 1, dtype=bool)
+        speech = np.convolve(speech, kernel, mode="same") > 0
+
+    # Find speech regions as [start, end) frame ranges
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    # Merge regions separated by short pauses; keep max_pause of each long
+    # pause, split evenly between the end of one region and the next
+    max_pause_samples = int(max_pause * sample_rate)
+    half = max_pause_samples // 2
+    kept = []
+    for start, end in zip(starts, ends):
+        region_start = int(start) * frame_size
+        region_end = len(samples) if end == len(speech) else int(end) * frame_size
+        if kept and region_start - kept[-1][1] <= max_pause_samples:
+            kept[-1][1] = region_end
+            continue
+        if kept:
+            kept[-1][1] += half
+            region_start -= max_pause_samples - half
+        kept.append([region_start, region_end])
+
+    pieces = []
+    compacted_length = 0
+    for region_start, region_end in kept:
+        timestamp_map.add(
+            compacted_length / sample_rate,
+            region_start / sample_rate,
+            (region_end - region_start) / sample_rate,
+        )
+        pieces.append(samples[region_start:region_end])
+        compacted_length += region_end - region_start
+
+    return np.concatenate(pieces), timestamp_map
+
+
+def normalize_loudness(
+    samples: np.ndarray, target_dbfs: float = -20.0, peak_dbfs: float = -1.0
+) -> np.ndarray:
+    """Scale audio to a target RMS level without letting peaks clip"""
+    audio = samples.astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(audio**2))
+    if rms < 1e-6:
+        return samples
+    peak = np.max(np.abs(audio))
+    gain = 10 ** (target_dbfs / 20) / rms
+    gain = min(gain, 10 ** (peak_dbfs / 20) / peak)
+    return np.clip(audio * gain * 32768.0, -32768, 32767).astype(np.int16)
@@ -0,0 +1,87 @@
+import asyncio
+import subprocess
+import time
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+
+class StageTimeoutError(Exception):
+    """Raised when a pipeline stage exceeds its share of the job deadline"""
+
+    def __init__(self, stage: str, timeout: float):
+        self.stage = stage
+        self.timeout = timeout
+        super().__init__(f"Stage '{stage}' timed out after {timeout:.1f}s")
+
+
+_stage_timeouts: Counter = Counter()
+_stage_timeouts_lock = threading.Lock()
+
+
+def record_stage_timeout(stage: str) -> None:
+    """Increment the timeout counter for a stage"""
+    with _stage_timeouts_lock:
+        _stage_timeouts[stage] += 1
+
+
+def get_stage_timeouts() -> Dict[str, int]:
+    """Return a snapshot of the per-stage timeout counters"""
+    with _stage_timeouts_lock:
+        return dict(_stage_timeouts)
+
+
+class Deadline:
+    """Deadline budget for a single job, split across its stages"""
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        """Seconds left before the job deadline"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def stage_timeout(self, stage: str, cap: Optional[float] = None) -> float:
+        """Timeout for the next stage: its own cap, bounded by what is left of the job
+
+        Raises StageTimeoutError if the job budget is already spent.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            record_stage_timeout(stage)
+            raise StageTimeoutError(stage, 0.0)
+        if cap is None:
+            return remaining
+        return min(cap, remaining)
+
+
+async def run_subprocess(args: List[str], stage: str, timeout: float) -> None:
+    """Run a child process without blocking the event loop
+
+    The child is killed if it runs past the timeout, and StageTimeoutError is
+    raised. A non-zero exit raises subprocess.CalledProcessError.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        record_stage_timeout(stage)
+        raise StageTimeoutError(stage, timeout)
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, args, stderr=stderr
+        )
@@ -0,0 +1,79 @@
+import hashlib
+import hmac
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+import orjson
+
+SIGNATURE_PREFIX = "sha256="
+
+# Quotes inside JSON strings are escaped, so these only match object keys.
+# Matching the key (not just the word) matters: every delivery, status
+# updates included, carries "field": "messages".
+_STATUSES_KEY = re.compile(rb'"statuses"\s*:')
+_MESSAGES_KEY = re.compile(rb'"messages"\s*:')
+
+
+class WebhookMessage(NamedTuple):
+    """The fields of an incoming WhatsApp message the bot acts on"""
+
+    sender: Optional[str]
+    type: str
+    media: Dict[str, Any]  # The "audio" or "document" object, if any
+    text: str
+
+
+class WebhookEnvelope(NamedTuple):
+    """Messages and status updates carried by a webhook delivery"""
+
+    messages: List[WebhookMessage]
+    has_statuses: bool
+
+
+def verify_signature(body: bytes, signature: Optional[str], app_secret: str) -> bool:
+    """Check Meta's X-Hub-Signature-256 header against the raw request body"""
+    if not signature or not signature.startswith(SIGNATURE_PREFIX):
+        return False
+    expected = hmac.new(app_secret.encode(), body, hashlib.sha256).hexdigest()
+    # Compare bytes: compare_digest rejects str containing non-ASCII characters,
+    # and header values arrive decoded as latin-1
+    received = signature[len(SIGNATURE_PREFIX) :].encode("latin-1", "replace")
+    return hmac.compare_digest(expected.encode(), received)
+
+
+def is_status_only(body: bytes) -> bool:
+    """Whether a delivery carries status updates and no messages
+
+    Works on the raw bytes so status deliveries can be answered without
+    parsing.
+    """
+    return (
+        _STATUSES_KEY.search(body) is not None
+        and _MESSAGES_KEY.search(body) is None
+    )
+
+
+def parse_webhook(body: bytes) -> WebhookEnvelope:
+    """Parse a webhook delivery into a lightweight envelope"""
+    payload = orjson.loads(body)
+    messages = []
+    has_statuses = False
+    for entry in payload.get("entry") or ():
+        for change in entry.get("changes") or ():
+            value = change.get("value") or {}
+            if value.get("statuses"):
+                has_statuses = True
+            for message in value.get("messages") or ():
+                message_type = message.get("type", "text")
+                messages.append(
+                    WebhookMessage(
+                        sender=message.get("from"),
+                        type=message_type,
+                        media=(
+                            message.get(message_type) or {}
+                            if message_type in ("audio", "document")
+                            else {}
+                        ),
+                        text=(message.get("text") or {}).get("body", ""),
+                    )
+                )
+    return WebhookEnvelope(messages=messages, has_statuses=has_statuses)